@@ -1,4 +1,5 @@
 import os
+import hashlib
 import tempfile
 import zipfile
 import io
@@ -7,7 +8,7 @@ import streamlit as st
 from utils.pdf_processing import (
     split_pdf_pages, merge_pdfs, extract_page_range, remove_first_last_pages,
     extract_text_from_pdf, keyword_highlight_pdf, extract_images, extract_tables,
-    ocr_pdf, reorder_pages, rotate_pages, add_watermark, extract_metadata
+    ocr_pdf, reorder_pages, rotate_pages, add_watermark, extract_metadata, open_pdf
 )
 from utils.pdf_analysis import rag_qa, summarize_text
 from utils.pdf_export import export_to_word, export_to_text, export_text_to_markdown
@@ -68,16 +69,32 @@ def download_bytes(label: str, data: bytes, file_name: str, mime: str):
 
 def zip_folder_to_bytes(folder_path: str) -> bytes:
     mem = io.BytesIO()
-    with zipfile.ZipFile(mem, "w", zipfile.ZIP_DEFLATED) as zf:
+    # Extracted images are already compressed (JPEG/PNG); deflating them again only burns CPU
+    with zipfile.ZipFile(mem, "w", zipfile.ZIP_STORED) as zf:
         for root, _, files in os.walk(folder_path):
             for f in files:
                 full = os.path.join(root, f)
                 arc = os.path.relpath(full, start=folder_path)
                 zf.write(full, arcname=arc)
-    mem.seek(0)
-    return mem.read()
+    return mem.getvalue()
 
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def cached_pdf_text(pdf_digest: str, _pdf_source: str | bytes) -> str:
+    # Keyed on the upload's SHA1; the source itself (temp path or bytes) is not hashed
+    return extract_text_from_pdf(_pdf_source)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def cached_page_count(pdf_digest: str, _pdf_source: str | bytes) -> int:
+    # MuPDF only loads the page tree here, unlike a full PdfReader parse
+    with open_pdf(_pdf_source) as doc:
+        return doc.page_count
+
+
+# Uploads up to this size are handed to the tools as bytes instead of a temp file
+IN_MEMORY_MAX_BYTES = 8 * 1024 * 1024
+
 OUTPUT_DIR = "outputs"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 def out_file(name: str) -> str:
@@ -95,14 +112,23 @@ if tool == "Merge PDFs":
 else:
     uploaded = st.file_uploader("Upload PDF", type=["pdf"])
     if uploaded:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(uploaded.read())
-            pdf_path = tmp.name
+        buf = uploaded.getbuffer()
+        pdf_digest = hashlib.sha1(buf).hexdigest()
+        if buf.nbytes <= IN_MEMORY_MAX_BYTES:
+            # Small uploads stay in RAM; every tool accepts raw PDF bytes
+            pdf_source = bytes(buf)
+        else:
+            # Large uploads spill to one file per upload, so reruns reuse it instead of rewriting it
+            pdf_source = os.path.join(tempfile.gettempdir(), f"{pdf_digest}.pdf")
+            if not os.path.exists(pdf_source):
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+                    tmp.write(buf)
+                # Rename into place so a concurrent session never sees a half-written file
+                os.replace(tmp.name, pdf_source)
 
         if tool == "Split PDF Pages":
             # Read total pages for UI
-            from PyPDF2 import PdfReader as _Reader
-            total_pages = len(_Reader(pdf_path).pages)
+            total_pages = cached_page_count(pdf_digest, pdf_source)
             option = st.radio("Select Option", ["All Pages", "Page Range", "Single Page"], horizontal=True)
 
             if option == "All Pages":
@@ -115,34 +141,33 @@ else:
                 end_page = start_page
 
             if st.button("Split & Download ZIP"):
-                zip_bytesio = split_pdf_pages(pdf_path, int(start_page), int(end_page))
+                zip_bytesio = split_pdf_pages(pdf_source, int(start_page), int(end_page))
                 download_bytes("📥 Download ZIP", zip_bytesio.getvalue(), "split_pages.zip", "application/zip")
 
         elif tool == "Extract Page Range":
-            from PyPDF2 import PdfReader as _Reader
-            total_pages = len(_Reader(pdf_path).pages)
+            total_pages = cached_page_count(pdf_digest, pdf_source)
             start_page = st.number_input("Start Page", 1, total_pages, 1)
             end_page = st.number_input("End Page", start_page, total_pages, total_pages)
             if st.button("Extract Range"):
-                out = extract_page_range(pdf_path, int(start_page), int(end_page))
+                out = extract_page_range(pdf_source, int(start_page), int(end_page))
                 download_bytes("📥 Download Extracted PDF", out.getvalue(), "extracted_range.pdf", "application/pdf")
 
         elif tool == "Remove First/Last Pages":
             remove_first = st.checkbox("Remove First Page", value=True)
             remove_last = st.checkbox("Remove Last Page", value=False)
             if st.button("Remove & Download"):
-                out = remove_first_last_pages(pdf_path, remove_first, remove_last)
+                out = remove_first_last_pages(pdf_source, remove_first, remove_last)
                 download_bytes("📥 Download Modified PDF", out.getvalue(), "modified.pdf", "application/pdf")
 
         elif tool == "Keyword Search & Highlight":
             keyword = st.text_input("Keyword to highlight", "")
             if st.button("Search & Highlight") and keyword.strip():
-                out_path = keyword_highlight_pdf(pdf_path, keyword.strip(), out_file("highlighted.pdf"))
+                out_path = keyword_highlight_pdf(pdf_source, keyword.strip(), out_file("highlighted.pdf"))
                 with open(out_path, "rb") as f:
                     download_bytes("📥 Download Highlighted PDF", f.read(), "highlighted.pdf", "application/pdf")
 
         elif tool == "Extract Images":
-            folder = extract_images(pdf_path, output_folder="images_out")
+            folder = extract_images(pdf_source, output_folder="images_out")
             # st.success(f"Extracted images → {folder}")
             if isinstance(folder, list):
                 folder = folder[0]
@@ -160,7 +185,7 @@ else:
                             st.image(img, caption=os.path.basename(img), use_container_width=True)
 
         elif tool == "Extract Tables":
-            tables = extract_tables(pdf_path)
+            tables = extract_tables(pdf_source)
             if not tables:
                 st.info("No tables detected.")
             else:
@@ -186,7 +211,7 @@ else:
                 index=0
             )
             if st.button("Run OCR"):
-                text = ocr_pdf(pdf_path, lang)
+                text = ocr_pdf(pdf_source, lang)
                 st.text_area("OCR Output", text, height=300)
 
         elif tool == "Reorder Pages":
@@ -194,7 +219,7 @@ else:
             order_str = st.text_input("New order", "")
             if st.button("Reorder") and order_str.strip():
                 new_order = [int(x.strip()) for x in order_str.split(",") if x.strip().isdigit()]
-                out_path = reorder_pages(pdf_path, new_order, out_file("reordered.pdf"))
+                out_path = reorder_pages(pdf_source, new_order, out_file("reordered.pdf"))
                 with open(out_path, "rb") as f:
                     download_bytes("📥 Download Reordered PDF", f.read(), "reordered.pdf", "application/pdf")
 
@@ -204,23 +229,23 @@ else:
             angle = st.number_input("Angle", min_value=0, max_value=360, value=90, step=90)
             if st.button("Rotate") and pages_str.strip():
                 pages = [int(x.strip()) for x in pages_str.split(",") if x.strip().isdigit()]
-                out_path = rotate_pages(pdf_path, pages, int(angle), out_file("rotated.pdf"))
+                out_path = rotate_pages(pdf_source, pages, int(angle), out_file("rotated.pdf"))
                 with open(out_path, "rb") as f:
                     download_bytes("📥 Download Rotated PDF", f.read(), "rotated.pdf", "application/pdf")
 
         elif tool == "Add Watermark":
             wm = st.text_input("Watermark text", "CONFIDENTIAL")
             if st.button("Apply Watermark"):
-                out_path = add_watermark(pdf_path, wm, out_file("watermarked.pdf"))
+                out_path = add_watermark(pdf_source, wm, out_file("watermarked.pdf"))
                 with open(out_path, "rb") as f:
                     download_bytes("📥 Download Watermarked PDF", f.read(), "watermarked.pdf", "application/pdf")
 
         elif tool == "Extract Metadata":
-            meta = extract_metadata(pdf_path)
+            meta = extract_metadata(pdf_source)
             st.json(meta)
 
         elif tool == "Summarize PDF":
-            text = extract_text_from_pdf(pdf_path)
+            text = cached_pdf_text(pdf_digest, pdf_source)
             # st.info("Using Together.ai LLaMA for summarization. Set TOGETHER_API_KEY in your environment.")
             if st.button("Summarize"):
                 with st.spinner("Summarizing... Please wait ⏳"):
@@ -231,7 +256,7 @@ else:
             # st.info("Uses FAISS + MiniLM embeddings + Together.ai LLaMA. Set TOGETHER_API_KEY in your environment.")
             question = st.text_input("Your question")
             if st.button("Ask") and question.strip():
-                text = extract_text_from_pdf(pdf_path)
+                text = cached_pdf_text(pdf_digest, pdf_source)
                 with st.spinner("Analyzing... Please wait ⏳"):
                     answer, sources = rag_qa(text, question)
                 st.subheader("Answer")
@@ -242,17 +267,17 @@ else:
                         st.markdown(f"**Source {i}:**\n\n{getattr(s, 'page_content', '')[:800]}")
 
         elif tool == "Export to Word (.docx)":
-            out = export_to_word(pdf_path, out_file("export.docx"))
+            out = export_to_word(pdf_source, out_file("export.docx"))
             with open(out, "rb") as f:
                 download_bytes("📥 Download DOCX", f.read(), "export.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
 
         elif tool == "Export to Text (.txt)":
-            out = export_to_text(pdf_path, out_file("export.txt"))
+            out = export_to_text(pdf_source, out_file("export.txt"))
             with open(out, "rb") as f:
                 download_bytes("📥 Download TXT", f.read(), "export.txt", "text/plain")
 
         elif tool == "Export to Markdown (.md)":
-            text = extract_text_from_pdf(pdf_path)
+            text = cached_pdf_text(pdf_digest, pdf_source)
             out = export_text_to_markdown(text, out_file("export.md"))
             with open(out, "rb") as f:
                 download_bytes("📥 Download MD", f.read(), "export.md", "text/markdown")
\ No newline at end of file
@@ -1,19 +1,112 @@
 import os
+import math
+import asyncio
+import platform
+import faiss
+import tiktoken
+import onnxruntime as ort
+import streamlit as st
+from onnx import TensorProto, helper
 from langchain.vectorstores import FAISS
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.schema import Document
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains import RetrievalQA
 from langchain.chat_models import ChatOpenAI
+from utils.vec_ops import normalize_2D
 
 from dotenv import load_dotenv
 load_dotenv()
 
-# Build FAISS retriever from raw text
-def build_retriever_from_text(text: str, chunk_size: int = 800, overlap: int = 100, k: int = 3):
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+# Pre-quantized int8 ONNX exports published alongside all-MiniLM-L6-v2
+def _int8_onnx_file() -> str:
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    return "onnx/model_quint8_avx2.onnx"
+
+
+# True only if ONNX Runtime can actually place a session on a CUDA device. get_available_providers()
+# reflects the installed build (e.g. onnxruntime-gpu), not whether a GPU is present.
+def _cuda_device_available() -> bool:
+    if "CUDAExecutionProvider" not in ort.get_available_providers():
+        return False
+    graph = helper.make_graph(
+        [helper.make_node("Identity", ["x"], ["y"])],
+        "cuda_probe",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+    try:
+        # Without a usable device ORT silently falls back to CPU, which shows up in get_providers()
+        session = ort.InferenceSession(model.SerializeToString(), providers=["CUDAExecutionProvider"])
+    except Exception:
+        return False
+    return "CUDAExecutionProvider" in session.get_providers()
+
+
+# (ONNX file, execution provider, encode batch size) for the current host.
+# EMBEDDING_ONNX_FILE overrides the CPU export only; the int8 files cannot run on the CUDA provider.
+def _onnx_runtime_config() -> tuple[str, str, int]:
+    if _cuda_device_available():
+        # Dynamic int8 kernels are CPU-only; on GPU the FP32 export with large batches is the fast path
+        return "onnx/model.onnx", "CUDAExecutionProvider", 128
+    return os.getenv("EMBEDDING_ONNX_FILE") or _int8_onnx_file(), "CPUExecutionProvider", 64
+
+
+# Shared MiniLM embedder (ONNX Runtime), loaded once per server process instead of on every rerun
+@st.cache_resource(show_spinner=False)
+def _get_embedder() -> HuggingFaceEmbeddings:
+    onnx_file, provider, batch_size = _onnx_runtime_config()
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={
+            "backend": "onnx",
+            "model_kwargs": {
+                "file_name": onnx_file,
+                "provider": provider,
+            },
+        },
+        encode_kwargs={"normalize_embeddings": True, "batch_size": batch_size},
+    )
+
+
+# FAISS index for a given text, reused across reruns and questions on the same PDF
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _build_vectorstore(text: str, chunk_size: int = 800, overlap: int = 100) -> FAISS:
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
     chunks = splitter.split_text(text)
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vs = FAISS.from_texts(chunks, embeddings)
+    embeddings = _get_embedder()
+    # Embed every chunk in a few large batches with the underlying SentenceTransformer
+    vectors = embeddings.client.encode(
+        chunks,
+        batch_size=embeddings.encode_kwargs["batch_size"],
+        show_progress_bar=False,
+        convert_to_numpy=True,
+    )
+    # all-MiniLM-L6-v2 already ends in a Normalize module, so this is a no-op safeguard: it keeps the
+    # inner-product index below cosine-correct if EMBEDDING_MODEL is swapped for a model without one
+    vectors = normalize_2D(vectors)
+    # 8-bit scalar-quantized inner-product index: 4x smaller than flat FP32, cosine on normalized vectors
+    index = faiss.IndexScalarQuantizer(vectors.shape[1], faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.add(vectors)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore({str(i): Document(page_content=chunk) for i, chunk in enumerate(chunks)}),
+        index_to_docstore_id={i: str(i) for i in range(len(chunks))},
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+    )
+
+
+# Build FAISS retriever from raw text
+def build_retriever_from_text(text: str, chunk_size: int = 800, overlap: int = 100, k: int = 3):
+    vs = _build_vectorstore(text, chunk_size, overlap)
     return vs.as_retriever(search_kwargs={"k": k})
 
 
@@ -29,26 +122,115 @@ def together_llm(model: str = "meta-llama/Llama-Vision-Free", temperature: float
 
 
 # Q&A over PDF (RAG)
-def rag_qa(text: str, question: str, model: str = "meta-llama/Llama-Vision-Free"):
-    retriever = build_retriever_from_text(text)
-    llm = together_llm(model=model)
-    qa = RetrievalQA.from_chain_type(
-        llm=llm,
-        retriever=retriever,
-        return_source_documents=True,
-        chain_type="stuff"
+def rag_qa(text: str, question: str, model: str = "meta-llama/Llama-Vision-Free", k: int = 3):
+    vs = _build_vectorstore(text)
+    # Top-k lookup + "stuff" prompt done inline; a RetrievalQA chain adds nothing for a single question
+    query_vector = _get_embedder().embed_query(question)
+    hits = vs.similarity_search_with_score_by_vector(query_vector, k=k)
+    sources = [doc for doc, _score in hits]
+    context = "\n\n".join(doc.page_content for doc in sources)
+    prompt = (
+        "Use the following pieces of context to answer the question at the end. "
+        "If you don't know the answer, just say that you don't know.\n\n"
+        f"Context:\n{context}\n\nQuestion: {question}\nAnswer:"
     )
-    result = qa({"query": question})
-    return result["result"], result.get("source_documents", [])
+    llm = together_llm(model=model)
+    output = llm.invoke(prompt)
+    return output.content.strip(), sources
+
+
+# Context windows of the Together models used here; unknown models get a conservative default
+MODEL_CONTEXT_TOKENS = {"meta-llama/Llama-Vision-Free": 131072}
+DEFAULT_CONTEXT_TOKENS = 8192
+# Room reserved for the instructions wrapped around the document text
+PROMPT_OVERHEAD_TOKENS = 256
+SUMMARY_MAX_TOKENS = 400
+PARTIAL_SUMMARY_MAX_TOKENS = 200
+# Concurrent map calls against the Together endpoint
+SUMMARY_CONCURRENCY = 8
+
+
+# Llama 3's tokenizer is a tiktoken BPE close to cl100k_base, which is accurate enough for budgeting
+@st.cache_resource(show_spinner=False)
+def _get_tokenizer() -> tiktoken.Encoding:
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def _count_tokens(text: str) -> int:
+    return len(_get_tokenizer().encode(text, disallowed_special=()))
+
+
+# Tokens of document text that fit in one prompt next to the instructions and the completion
+def _input_budget(model: str, max_tokens: int) -> int:
+    return MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS) - max_tokens - PROMPT_OVERHEAD_TOKENS
+
+
+# Cluster chunks with k-means; each group keeps the members nearest its centroid that fit in `budget` tokens
+def _cluster_chunk_groups(vs: FAISS, k: int, budget: int) -> list[str]:
+    ntotal = vs.index.ntotal
+    chunks = [vs.docstore.search(vs.index_to_docstore_id[i]).page_content for i in range(ntotal)]
+    vectors = vs.index.reconstruct_n(0, ntotal)
+    kmeans = faiss.Kmeans(vectors.shape[1], k, niter=20, seed=1)
+    kmeans.train(vectors)
+    distances, labels = kmeans.index.search(vectors, 1)
+
+    members = {}
+    for i in sorted(range(ntotal), key=lambda i: distances[i, 0]):
+        members.setdefault(int(labels[i, 0]), []).append(i)
+    groups = []
+    for ids in members.values():
+        picked, used = [], 0
+        for i in ids:
+            tokens = _count_tokens(chunks[i])
+            if used + tokens > budget:
+                break
+            picked.append(i)
+            used += tokens
+        if picked:
+            groups.append(sorted(picked))
+    # Keep document order so the partial summaries read in sequence
+    groups.sort()
+    return ["\n\n".join(chunks[i] for i in group) for group in groups]
+
+
+async def _summarize_chunks(llm, chunks: list[str]) -> list[str]:
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def summarize(chunk: str) -> str:
+        prompt = (
+            "Summarize the key facts, numbers, and definitions in these excerpts in up to 6 bullet points. "
+            f"Excerpts:\n\n{chunk}"
+        )
+        async with semaphore:
+            output = await llm.ainvoke(prompt)
+        return output.content.strip()
+
+    return await asyncio.gather(*(summarize(chunk) for chunk in chunks))
 
 
 # Summarize PDF text
 def summarize_text(text: str, model: str = "meta-llama/Llama-Vision-Free"):
+    llm = together_llm(model=model, temperature=0.2, max_tokens=SUMMARY_MAX_TOKENS)
+    budget = _input_budget(model, SUMMARY_MAX_TOKENS)
+    text_tokens = _count_tokens(text)
+    if text_tokens > budget:
+        # Map-reduce: summarize clusters of related chunks concurrently, then combine the partial summaries.
+        # Use twice the clusters strictly needed to cover the text (clusters are uneven), but never more
+        # partial summaries than the reduce prompt can hold.
+        vs = _build_vectorstore(text)
+        map_budget = _input_budget(model, PARTIAL_SUMMARY_MAX_TOKENS)
+        clusters = min(
+            vs.index.ntotal,
+            math.ceil(2 * text_tokens / map_budget),
+            budget // PARTIAL_SUMMARY_MAX_TOKENS,
+        )
+        groups = _cluster_chunk_groups(vs, clusters, map_budget)
+        map_llm = together_llm(model=model, temperature=0.2, max_tokens=PARTIAL_SUMMARY_MAX_TOKENS)
+        text = "\n\n".join(asyncio.run(_summarize_chunks(map_llm, groups)))
     prompt = (
         "You are a concise technical summarizer. Summarize the following document in 6-10 bullet points, "
         "preserving key facts, numbers, and definitions. Text:\n\n"
         f"{text}"
     )
-    llm = together_llm(model=model, temperature=0.2, max_tokens=400)
     output = llm.invoke(prompt)
     return output.content.strip()
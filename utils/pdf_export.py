@@ -1,24 +1,77 @@
-import fitz
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from docx import Document
+from docx.enum.section import WD_SECTION
+from docxcompose.composer import Composer
 from pdf2docx import Converter
 import pypandoc
+from utils.pdf_processing import open_pdf, pdf_file_path
 
 
-def export_to_word(pdf_path: str, output_path: str = "output.docx") -> str:
-    """Convert PDF to DOCX (layout-aware)."""
+# Below this many pages, worker start-up outweighs converting shards in parallel
+PARALLEL_DOCX_MIN_PAGES = 8
+# Each shard re-parses document-level resources (fonts, styles), so keep shards at least this long
+DOCX_MIN_SHARD_PAGES = 4
+
+
+# Everything pdf2docx sets per page section; copied so a shard's last page keeps its own geometry
+_PAGE_SETUP_ATTRS = (
+    "orientation", "page_width", "page_height",
+    "left_margin", "right_margin", "top_margin", "bottom_margin",
+    "header_distance", "footer_distance", "gutter",
+)
+
+
+def _convert_docx_shard(args) -> str:
+    """Convert pages [start, end) to their own DOCX; runs inside a worker process."""
+    pdf_path, start, end, shard_path = args
     cv = Converter(pdf_path)
-    cv.convert(output_path, start=0, end=None)
+    cv.convert(shard_path, start=start, end=end)
     cv.close()
+    return shard_path
+
+
+def export_to_word(pdf_path: str | bytes, output_path: str = "output.docx") -> str:
+    """Convert PDF to DOCX (layout-aware); longer documents are converted in page shards across processes."""
+    with open_pdf(pdf_path) as doc:
+        page_count = doc.page_count
+    if page_count < PARALLEL_DOCX_MIN_PAGES:
+        cv = Converter(stream=pdf_path) if isinstance(pdf_path, (bytes, bytearray)) else Converter(pdf_path)
+        cv.convert(output_path, start=0, end=None)
+        cv.close()
+        return output_path
+
+    workers = max(1, min(os.cpu_count() or 1, page_count // DOCX_MIN_SHARD_PAGES))
+    step = -(-page_count // workers)
+    # Partial DOCX files live in a private directory per call, so concurrent sessions never collide
+    with pdf_file_path(pdf_path) as path, tempfile.TemporaryDirectory() as shard_dir:
+        tasks = [
+            (path, start, min(start + step, page_count), os.path.join(shard_dir, f"shard_{start:06d}.docx"))
+            for start in range(0, page_count, step)
+        ]
+        with ProcessPoolExecutor(max_workers=len(tasks)) as executor:
+            shard_paths = list(executor.map(_convert_docx_shard, tasks))
+
+        master = Document(shard_paths[0])
+        composer = Composer(master)
+        for shard_path in shard_paths[1:]:
+            shard = Document(shard_path)
+            # pdf2docx gives every page its own section: close the previous shard's last page with a
+            # section break (it keeps that page's setup), then give the open section the new shard's last page setup
+            master.add_section(WD_SECTION.NEW_PAGE)
+            composer.append(shard)
+            for attr in _PAGE_SETUP_ATTRS:
+                setattr(master.sections[-1], attr, getattr(shard.sections[-1], attr))
+        composer.save(output_path)
     return output_path
 
 
-def export_to_text(pdf_path: str, output_path: str = "output.txt") -> str:
+def export_to_text(pdf_path: str | bytes, output_path: str = "output.txt") -> str:
     """Export selectable text to TXT."""
-    text = ""
-    with fitz.open(pdf_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(text)
+    # Write page by page so the full document text is never held in memory
+    with open_pdf(pdf_path) as doc, open(output_path, "w", encoding="utf-8") as f:
+        f.writelines(page.get_text("text") for page in doc)
     return output_path
 
 
@@ -1,33 +1,74 @@
 import os
 import io
+import tempfile
 import zipfile
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
 from PIL import Image
 import pytesseract
 import pdfplumber
 import camelot
-from PyPDF2 import PdfReader, PdfWriter
+import pikepdf
+
+
+# -------------------------
+# PDF SOURCES
+# -------------------------
+# Tools accept either a filesystem path or the raw PDF bytes of an in-memory upload.
+
+def open_pdf(pdf_path: str | bytes) -> fitz.Document:
+    """Open a path or in-memory PDF bytes with PyMuPDF."""
+    if isinstance(pdf_path, (bytes, bytearray)):
+        return fitz.open(stream=pdf_path, filetype="pdf")
+    return fitz.open(pdf_path)
+
+
+def _open_pikepdf(pdf_path: str | bytes) -> pikepdf.Pdf:
+    if isinstance(pdf_path, (bytes, bytearray)):
+        return pikepdf.Pdf.open(io.BytesIO(pdf_path))
+    return pikepdf.Pdf.open(pdf_path)
+
+
+@contextmanager
+def pdf_file_path(pdf_path: str | bytes):
+    """Yield a filesystem path for tools that need one, spilling in-memory bytes to a temp file."""
+    if not isinstance(pdf_path, (bytes, bytearray)):
+        yield pdf_path
+        return
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(pdf_path)
+    try:
+        yield tmp.name
+    finally:
+        os.remove(tmp.name)
 
 
 # -------------------------
 # BASIC PDF TOOLS (your originals)
 # -------------------------
 
-def split_pdf_pages(pdf_path: str, start_page: int, end_page: int) -> io.BytesIO:
+def _save_to_buffer(pdf: pikepdf.Pdf) -> io.BytesIO:
+    out = io.BytesIO()
+    pdf.save(out)
+    out.seek(0)
+    return out
+
+
+def split_pdf_pages(pdf_path: str | bytes, start_page: int, end_page: int) -> io.BytesIO:
     """
     Split selected pages into separate PDFs and return a ZIP (in-memory).
     start_page/end_page are 1-indexed (inclusive).
     """
-    reader = PdfReader(pdf_path)
     zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zipf:
+    # PDFs are already compressed internally, so store entries instead of deflating them again
+    with _open_pikepdf(pdf_path) as src, zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_STORED) as zipf:
         for i in range(start_page, end_page + 1):
-            writer = PdfWriter()
-            writer.add_page(reader.pages[i - 1])
-            pdf_bytes = io.BytesIO()
-            writer.write(pdf_bytes)
-            pdf_bytes.seek(0)
-            zipf.writestr(f"page_{i}.pdf", pdf_bytes.read())
+            with pikepdf.Pdf.new() as dst:
+                dst.pages.append(src.pages[i - 1])
+                # Write each page PDF straight into its ZIP entry, no intermediate buffer
+                with zipf.open(f"page_{i}.pdf", "w", force_zip64=True) as zfp:
+                    dst.save(zfp)
     zip_buffer.seek(0)
     return zip_buffer
 
@@ -37,126 +78,232 @@ def merge_pdfs(files_or_paths) -> io.BytesIO:
     Merge multiple PDFs. Accepts a list of file-like objects or file paths.
     Returns merged PDF as BytesIO.
     """
-    writer = PdfWriter()
-    for f in files_or_paths:
-        reader = PdfReader(f) if hasattr(f, "read") else PdfReader(str(f))
-        for page in reader.pages:
-            writer.add_page(page)
-    out = io.BytesIO()
-    writer.write(out)
-    out.seek(0)
+    with fitz.open() as dst:
+        for f in files_or_paths:
+            if hasattr(f, "read"):
+                # Read from the start even if the caller has already consumed the stream
+                if hasattr(f, "getvalue"):
+                    data = f.getvalue()
+                else:
+                    f.seek(0)
+                    data = f.read()
+                src = fitz.open(stream=data, filetype="pdf")
+            else:
+                src = fitz.open(str(f))
+            with src:
+                # insert_pdf copies the whole page tree in a single MuPDF call
+                dst.insert_pdf(src)
+        out = io.BytesIO(dst.tobytes(garbage=4, deflate=True, clean=True))
+    # MuPDF accumulates warnings per process; drop them so long sessions don't grow the store
+    fitz.TOOLS.reset_mupdf_warnings()
     return out
 
 
-def extract_page_range(pdf_path: str, start_page: int, end_page: int) -> io.BytesIO:
+def extract_page_range(pdf_path: str | bytes, start_page: int, end_page: int) -> io.BytesIO:
     """Extract a page range (1-indexed, inclusive) into a single PDF (in-memory)."""
-    reader = PdfReader(pdf_path)
-    writer = PdfWriter()
-    for i in range(start_page, end_page + 1):
-        writer.add_page(reader.pages[i - 1])
-    out = io.BytesIO()
-    writer.write(out)
-    out.seek(0)
-    return out
+    with _open_pikepdf(pdf_path) as src, pikepdf.Pdf.new() as dst:
+        dst.pages.extend(src.pages[start_page - 1:end_page])
+        return _save_to_buffer(dst)
 
 
-def remove_first_last_pages(pdf_path: str, remove_first: bool, remove_last: bool) -> io.BytesIO:
+def remove_first_last_pages(pdf_path: str | bytes, remove_first: bool, remove_last: bool) -> io.BytesIO:
     """Remove first and/or last page and return modified PDF (in-memory)."""
-    reader = PdfReader(pdf_path)
-    writer = PdfWriter()
-    total = len(reader.pages)
-    for i in range(total):
-        if (remove_first and i == 0) or (remove_last and i == total - 1):
-            continue
-        writer.add_page(reader.pages[i])
-    out = io.BytesIO()
-    writer.write(out)
-    out.seek(0)
-    return out
+    with _open_pikepdf(pdf_path) as pdf:
+        if remove_last and len(pdf.pages) > 0:
+            del pdf.pages[-1]
+        if remove_first and len(pdf.pages) > 0:
+            del pdf.pages[0]
+        return _save_to_buffer(pdf)
+
+
+# -------------------------
+# PARALLEL HELPERS
+# -------------------------
+
+# PyMuPDF documents must not be shared across threads, so page-level work runs in
+# worker processes that each open their own handle once in _init_pdf_worker.
+_worker_doc = None
+
+# Below these sizes, process start-up costs more than doing the work serially
+PARALLEL_TEXT_MIN_PAGES = 200
+PARALLEL_IMAGES_MIN = 16
+
+
+def _worker_count(task_count: int, env_var: str | None = None) -> int:
+    """Worker count for a pool: all cores unless capped by env_var, never more than task_count."""
+    workers = int((env_var and os.getenv(env_var)) or os.cpu_count() or 1)
+    return max(1, min(workers, task_count))
+
+
+def _page_segments(page_count: int, parts: int) -> list[tuple[int, int]]:
+    """Split range(page_count) into at most `parts` contiguous (start, stop) ranges."""
+    step = -(-page_count // parts)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+
+def _init_pdf_worker(pdf_path: str | bytes) -> None:
+    global _worker_doc
+    _worker_doc = open_pdf(pdf_path)
 
 
 # -------------------------
 # ADVANCED UTILITIES
 # -------------------------
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract selectable text (not OCR) via PyMuPDF."""
-    text = ""
-    with fitz.open(pdf_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
+def _extract_text_segment(bounds: tuple[int, int]) -> str:
+    start, stop = bounds
+    return "".join([_worker_doc[i].get_text("text") for i in range(start, stop)])
+
+
+def extract_text_from_pdf(pdf_path: str | bytes) -> str:
+    """Extract selectable text (not OCR) via PyMuPDF; large documents are split across processes."""
+    with open_pdf(pdf_path) as doc:
+        if doc.page_count < PARALLEL_TEXT_MIN_PAGES:
+            return "".join([page.get_text("text") for page in doc])
+        page_count = doc.page_count
+    workers = _worker_count(page_count)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker, initargs=(pdf_path,)) as executor:
+        return "".join(executor.map(_extract_text_segment, _page_segments(page_count, workers)))
+
 
+def _search_segment(args) -> list[list[tuple]]:
+    (start, stop), keyword = args
+    # Quads go back as plain point tuples so they pickle cleanly across processes
+    return [
+        [tuple(tuple(point) for point in quad)
+         for quad in _worker_doc[i].search_for(keyword, quads=True)]
+        for i in range(start, stop)
+    ]
 
-def keyword_highlight_pdf(pdf_path: str, keyword: str, output_path: str = "highlighted.pdf") -> str:
+
+def keyword_highlight_pdf(pdf_path: str | bytes, keyword: str, output_path: str = "highlighted.pdf") -> str:
     """Search keyword and highlight occurrences in the PDF (case-insensitive)."""
-    doc = fitz.open(pdf_path)
-    for page in doc:
-        matches = page.search_for(keyword, quads=False)
-        for rect in matches:
-            page.add_highlight_annot(rect)
+    doc = open_pdf(pdf_path)
+    if doc.page_count < PARALLEL_TEXT_MIN_PAGES:
+        page_quads = [page.search_for(keyword, quads=True) for page in doc]
+    else:
+        workers = _worker_count(doc.page_count)
+        tasks = [(segment, keyword) for segment in _page_segments(doc.page_count, workers)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker, initargs=(pdf_path,)) as executor:
+            page_quads = [
+                [fitz.Quad(*points) for points in quads]
+                for segment in executor.map(_search_segment, tasks)
+                for quads in segment
+            ]
+
+    # Annotations are written here only; one highlight per page covers all of its matches
+    for page, quads in zip(doc, page_quads):
+        if quads:
+            page.add_highlight_annot(quads)
     doc.save(output_path, garbage=4, deflate=True)
     return output_path
 
 
-def extract_images(pdf_path: str, output_folder: str = "extracted_images") -> list[str]:
+def _write_image(doc, xref: int, stem: str) -> str:
+    base_image = doc.extract_image(xref)
+    image_filename = f"{stem}.{base_image['ext']}"
+    with open(image_filename, "wb") as f:
+        f.write(base_image["image"])
+    return image_filename
+
+
+def _extract_image_job(job: tuple[int, str]) -> str:
+    return _write_image(_worker_doc, *job)
+
+
+def extract_images(pdf_path: str | bytes, output_folder: str = "extracted_images") -> list[str]:
     """Extract embedded images to a folder; returns list of saved image paths."""
     os.makedirs(output_folder, exist_ok=True)
-    doc = fitz.open(pdf_path)
-
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        images = page.get_images(full=True)
-        for img_index, img in enumerate(images):
-            xref = img[0]
-            base_image = doc.extract_image(xref)
-            image_bytes = base_image["image"]
-            image_ext = base_image["ext"]
-            image_filename = os.path.join(
-                output_folder,
-                f"page_{page_num+1}_img_{img_index+1}.{image_ext}"
-            )
-            with open(image_filename, "wb") as f:
-                f.write(image_bytes)
+
+    # Cheap serial pass: collect (xref, output stem) for every image reference
+    jobs = []
+    with open_pdf(pdf_path) as doc:
+        for page_num in range(len(doc)):
+            for img_index, img in enumerate(doc[page_num].get_images(full=True)):
+                stem = os.path.join(output_folder, f"page_{page_num+1}_img_{img_index+1}")
+                jobs.append((img[0], stem))
+
+        if len(jobs) < PARALLEL_IMAGES_MIN:
+            for xref, stem in jobs:
+                _write_image(doc, xref, stem)
+            return output_folder
+
+    # Decoding and writing dominate, so spread them over worker processes
+    workers = _worker_count(len(jobs))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker, initargs=(pdf_path,)) as executor:
+        list(executor.map(_extract_image_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
 
     return output_folder
 
 
-def extract_tables(pdf_path: str):
+def extract_tables(pdf_path: str | bytes):
     """
-    Try Camelot first; fall back to pdfplumber.
+    Pre-scan with pdfplumber; run Camelot only on pages with table candidates.
     Returns list of DataFrames (Camelot) or list-of-rows tables (pdfplumber).
     """
+    candidate_pages = []
+    fallback = []
+    with pdfplumber.open(io.BytesIO(pdf_path) if isinstance(pdf_path, (bytes, bytearray)) else pdf_path) as pdf:
+        for page_num, page in enumerate(pdf.pages, start=1):
+            found = page.find_tables()
+            if found:
+                candidate_pages.append(page_num)
+                fallback.extend(t.extract() for t in found)
+
+    # No ruled/aligned regions anywhere: skip Camelot and its Ghostscript start-up entirely
+    if not candidate_pages:
+        return []
+
     try:
-        tables = camelot.read_pdf(pdf_path, pages="all")
+        # Camelot only reads from disk
+        with pdf_file_path(pdf_path) as path:
+            tables = camelot.read_pdf(path, pages=",".join(map(str, candidate_pages)))
         if tables.n > 0:
             return [t.df for t in tables]
     except Exception:
         pass
 
-    results = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            page_tables = page.extract_tables()
-            results.extend(page_tables or [])
-    return results
+    return fallback
+
+
+def _init_ocr_worker(pdf_path: str | bytes, tesseract_threads: int) -> None:
+    # Only this worker's Tesseract subprocesses inherit the limit; the rest of the app is untouched
+    os.environ["OMP_THREAD_LIMIT"] = str(tesseract_threads)
+    _init_pdf_worker(pdf_path)
+
+
+def _ocr_page(args) -> str:
+    """Rasterize and OCR a single page; runs inside a worker process."""
+    page_index, lang, config, dpi = args
+    # Render straight to 8-bit grayscale without alpha and hand the raw samples to PIL
+    pix = _worker_doc[page_index].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    return pytesseract.image_to_string(img, lang=lang, config=config)
 
 
-def ocr_pdf(pdf_path: str, lang: str = "eng") -> str:
-    """OCR image-only pages via Tesseract and PyMuPDF rasterization."""
-    text = ""
-    with fitz.open(pdf_path) as doc:
-        for page in doc:
-            pix = page.get_pixmap()
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            custom_config = r'--oem 3 --psm 6'
-            text += pytesseract.image_to_string(img, lang=lang, config=custom_config) + "\n"
-    return text
+def ocr_pdf(pdf_path: str | bytes, lang: str = "eng", dpi: int = 300) -> str:
+    """OCR image-only pages via Tesseract and PyMuPDF rasterization (one page per worker process)."""
+    custom_config = r'--oem 3 --psm 6'
+    with open_pdf(pdf_path) as doc:
+        page_count = doc.page_count
+    if page_count == 0:
+        return ""
+    tasks = [(i, lang, custom_config, dpi) for i in range(page_count)]
+    workers = _worker_count(page_count, "OCR_CONCURRENCY")
+    # Share the cores left over by a small pool between Tesseract's OpenMP threads (it gains little past 4)
+    tesseract_threads = max(1, min(4, (os.cpu_count() or 1) // workers))
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_ocr_worker,
+        initargs=(pdf_path, tesseract_threads),
+    ) as executor:
+        # executor.map yields results in submission order, so pages stay in sequence
+        return "".join(page_text + "\n" for page_text in executor.map(_ocr_page, tasks))
 
 
-def reorder_pages(pdf_path: str, new_order: list[int], output_path: str = "reordered.pdf") -> str:
+def reorder_pages(pdf_path: str | bytes, new_order: list[int], output_path: str = "reordered.pdf") -> str:
     """Reorder pages by 0-indexed positions. Saves to output_path."""
-    src = fitz.open(pdf_path)
+    src = open_pdf(pdf_path)
     dst = fitz.open()
     for i in new_order:
         dst.insert_pdf(src, from_page=i, to_page=i)
@@ -164,18 +311,18 @@ def reorder_pages(pdf_path: str, new_order: list[int], output_path: str = "reord
     return output_path
 
 
-def rotate_pages(pdf_path: str, pages_to_rotate: list[int], angle: int, output_path: str = "rotated.pdf") -> str:
+def rotate_pages(pdf_path: str | bytes, pages_to_rotate: list[int], angle: int, output_path: str = "rotated.pdf") -> str:
     """Rotate selected 0-indexed pages by angle (e.g., 90/180/270)."""
-    doc = fitz.open(pdf_path)
+    doc = open_pdf(pdf_path)
     for p in pages_to_rotate:
         doc[p].set_rotation(angle)
     doc.save(output_path)
     return output_path
 
 
-def add_watermark(pdf_path: str, watermark_text: str, output_path: str = "watermarked.pdf") -> str:
+def add_watermark(pdf_path: str | bytes, watermark_text: str, output_path: str = "watermarked.pdf") -> str:
     """Add semi-transparent diagonal text watermark to all pages."""
-    doc = fitz.open(pdf_path)
+    doc = open_pdf(pdf_path)
     for page in doc:
         rect = page.rect
         page.insert_text(
@@ -189,7 +336,7 @@ def add_watermark(pdf_path: str, watermark_text: str, output_path: str = "waterm
     return output_path
 
 
-def extract_metadata(pdf_path: str) -> dict:
+def extract_metadata(pdf_path: str | bytes) -> dict:
     """Return PDF metadata dictionary."""
-    with fitz.open(pdf_path) as doc:
+    with open_pdf(pdf_path) as doc:
         return doc.metadata or {}
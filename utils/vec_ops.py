@@ -0,0 +1,26 @@
+import math
+import numpy as np
+from numba import njit, prange
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _normalize_rows(emb):
+    for i in prange(emb.shape[0]):
+        norm = 0.0
+        for j in range(emb.shape[1]):
+            norm += emb[i, j] * emb[i, j]
+        norm = math.sqrt(norm)
+        if norm > 0.0:
+            for j in range(emb.shape[1]):
+                emb[i, j] /= norm
+
+
+def normalize_2D(emb: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize each row of a 2-D embedding matrix (in place if already float32 C-contiguous).
+    Rows that are already unit length are left unchanged, up to float rounding.
+    """
+    emb = np.ascontiguousarray(emb, dtype=np.float32)
+    # Keep the compiled kernel monomorphic (float32, C-contiguous) to avoid re-typing per call
+    _normalize_rows(emb)
+    return emb